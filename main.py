@@ -1,9 +1,10 @@
-import argparse
+import re
 import struct
+import sys
 
 from dataclasses import dataclass, field
 from pathlib import Path
-from typing import BinaryIO, Iterable, Sequence
+from typing import Callable, Iterable, Sequence
 
 
 # Supposedly, the current version of the program
@@ -15,8 +16,42 @@ MAGIC_EXTRA_METADATA = 'V02'
 # Uninterpreted value that appears at the end of projects with extra metadata
 MAGIC_FINAL_INTEGER = 704
 
-
-@dataclass
+# Pre-compiled format for the fixed-size fields of a frames interval
+INTERVAL_STRUCT = struct.Struct('<i??ii')
+
+# Pre-compiled format for the fixed-size settings that follow the image paths
+PROJECT_SETTINGS_STRUCT = struct.Struct('<?ffffff')
+
+# Pre-compiled format for the fixed-size fields of the extra metadata
+PROJECT_METADATA_STRUCT = struct.Struct('<i?f')
+
+# Encoded forms of the magic constants, computed once for the write path
+MAGIC_PROGRAM_VERSION_BYTES = MAGIC_PROGRAM_VERSION.encode('ascii') + b'\0'
+MAGIC_EXTRA_METADATA_BYTES = MAGIC_EXTRA_METADATA.encode('ascii') + b'\0'
+MAGIC_FINAL_INTEGER_BYTES = MAGIC_FINAL_INTEGER.to_bytes(4, 'little')
+
+# Names of the synthesis detail levels, indexed by their level number
+SYNTHESIS_DETAIL_NAMES = ('Unknown', 'High', 'Medium', 'Low', 'Garbage')
+
+# All project settings that can be overridden by a command-line argument
+MAPPED_ARGUMENT_NAMES = (
+	'frames_per_second',
+	'key_images_path',
+	'video_images_path',
+	'mask_images_path',
+	'key_images_weight',
+	'video_images_weight',
+	'mask_images_weight',
+	'mask_images_enabled',
+	'mapping',
+	'de_flicker',
+	'diversity',
+	'synthesis_detail',
+	'use_gpu',
+)
+
+
+@dataclass(slots=True)
 class EbSynthInterval:
 	""" Represents an EbSynth frames interval. """
 
@@ -38,8 +73,13 @@ class EbSynthInterval:
 	# Relative path to the synthesized frames
 	output_path: str = r'out\[#####].png'
 
+	# Cached encoding of the output path, reused while it is unchanged
+	output_path_cache: tuple[str, bytes] | None = field(
+		default=None, init=False, repr=False, compare=False,
+	)
+
 
-@dataclass
+@dataclass(slots=True)
 class EbSynthProject:
 	""" Represents an EbSynth project. """
 
@@ -92,214 +132,310 @@ class EbSynthProject:
 def get_synthesis_detail_name(level: int) -> str:
 	""" Return the name of the given synthesis detail `level`. """
 
-	match level:
-		case 1:
-			return 'High'
-		case 2:
-			return 'Medium'
-		case 3:
-			return 'Low'
-		case 4:
-			return 'Garbage'
-		case _:
-			return 'Unknown'
-
-
-def print_interval(interval: EbSynthInterval, padding: int):
-	""" Print formatted information about the given frames `interval`. """
-
-	def is_used_symbol(value: bool) -> str:
-		return 'Y' if value else 'N'
-
-	print(
-		f'{interval.first_frame:>{padding}}',
-		is_used_symbol(interval.first_frame_is_used), '|',
-		f'{interval.key_frame:>{padding}}', '|',
-		f'{interval.final_frame:>{padding}}',
-		is_used_symbol(interval.final_frame_is_used), '|',
-		interval.output_path,
+	if 0 < level < len(SYNTHESIS_DETAIL_NAMES):
+		return SYNTHESIS_DETAIL_NAMES[level]
+	else:
+		return 'Unknown'
+
+
+def format_synthesis_detail(project: EbSynthProject) -> str:
+	""" Return the formatted synthesis detail of the given `project`. """
+
+	detail_name = get_synthesis_detail_name(project.synthesis_detail)
+	return f'{project.synthesis_detail} ({detail_name})'
+
+
+# Printed report categories with their field labels and value getters
+PRINTED_CATEGORIES = (
+	('Project', (
+		('EbSynth version', lambda project: project.program_version),
+		('Frames per second', lambda project: project.frames_per_second),
+	)),
+	('Image paths', (
+		('Key images path', lambda project: project.key_images_path),
+		('Video images path', lambda project: project.video_images_path),
+		('Mask images path', lambda project: project.mask_images_path),
+	)),
+	('Image weights', (
+		('Key images weight', lambda project: project.key_images_weight),
+		('Video images weight', lambda project: project.video_images_weight),
+		('Mask images weight', lambda project: project.mask_images_weight),
+		('Mask images enabled', lambda project: project.mask_images_enabled),
+	)),
+	('Advanced', (
+		('Mapping', lambda project: project.mapping),
+		('De-flicker', lambda project: project.de_flicker),
+		('Diversity', lambda project: project.diversity),
+	)),
+	('Performance', (
+		('Synthesis detail', format_synthesis_detail),
+		('Use GPU', lambda project: project.use_gpu),
+	)),
+)
+
+# Width of the label column of each category, computed once from the labels
+CATEGORY_PADDINGS = tuple(
+	max(len(label) for label, _ in fields) for _, fields in PRINTED_CATEGORIES
+)
+
+
+def format_interval(interval: EbSynthInterval) -> str:
+	""" Return a formatted line about the given frames `interval`. """
+
+	return (
+		f'{interval.first_frame:>8} '
+		f'{"Y" if interval.first_frame_is_used else "N"} | '
+		f'{interval.key_frame:>8} | '
+		f'{interval.final_frame:>8} '
+		f'{"Y" if interval.final_frame_is_used else "N"} | '
+		f'{interval.output_path}'
 	)
 
 
 def print_project(project: EbSynthProject):
 	""" Print formatted information about the given `project`. """
 
-	# Format the synthesis detail
-	synthesis_detail_name = get_synthesis_detail_name(project.synthesis_detail)
-	synthesis_detail = f'{project.synthesis_detail} ({synthesis_detail_name})'
-
-	# All printed categories that contain field names and their value
-	categories = {
-		'Project': {
-			'EbSynth version': project.program_version,
-			'Frames per second': project.frames_per_second,
-		},
-		'Image paths': {
-			'Key images path': project.key_images_path,
-			'Video images path': project.video_images_path,
-			'Mask images path': project.mask_images_path,
-		},
-		'Image weights': {
-			'Key images weight': project.key_images_weight,
-			'Video images weight': project.video_images_weight,
-			'Mask images weight': project.mask_images_weight,
-			'Mask images enabled': project.mask_images_enabled,
-		},
-		'Advanced': {
-			'Mapping': project.mapping,
-			'De-flicker': project.de_flicker,
-			'Diversity': project.diversity,
-		},
-		'Performance': {
-			'Synthesis detail': synthesis_detail,
-			'Use GPU': project.use_gpu,
-		}
-	}
-
-	# Print all information about the project
-	for category_name, field_name_and_value in categories.items():
-		print(category_name)
-		print('-' * len(category_name))
-
-		padding = max(map(lambda x: len(x[0]), field_name_and_value.items()))
-		for name, value in field_name_and_value.items():
-			print(f'{name}:'.ljust(padding + 1), value)
-
-		print()
-
-	# Print all intervals in the project
+	# Format all information about the project
+	lines = []
+	categories = zip(PRINTED_CATEGORIES, CATEGORY_PADDINGS)
+	for (category_name, fields), padding in categories:
+		lines.append(category_name)
+		lines.append('-' * len(category_name))
+
+		for label, get_value in fields:
+			lines.append(f'{label}:'.ljust(padding + 1) + f' {get_value(project)}')
+
+		lines.append('')
+
+	# Format all intervals in the project
 	intervals_label = 'Intervals'
-	print('Intervals')
-	print('-' * len(intervals_label))
-	print(
-		'Start   ', '?', '|',
-		'Key     ', '|',
-		'Final   ', '?', '|',
-		'Output',
-	)
+	lines.append(intervals_label)
+	lines.append('-' * len(intervals_label))
+	lines.append('Start    ? | Key      | Final    ? | Output')
 
 	for interval in project.intervals:
-		print_interval(interval, 8)
+		lines.append(format_interval(interval))
+
+	# Emit the whole report in a single write
+	sys.stdout.write('\n'.join(lines) + '\n')
+
+
+@dataclass(slots=True)
+class BufferReader:
+	""" Reads through an in-memory binary buffer, tracking a position. """
 
+	# Binary buffer that contains a whole project file
+	buffer: memoryview
 
-def read_bool(buffer: BinaryIO) -> bool:
-	return struct.unpack('<?', buffer.read(1))[0]
+	# Current position in the buffer
+	position: int = 0
 
+	def read(self, count: int) -> memoryview:
+		""" Return a view of the next `count` bytes and advance past them. """
 
-def write_bool(buffer: BinaryIO, value: bool):
-	return buffer.write(struct.pack('<?', value))
+		view = self.buffer[self.position:self.position + count]
+		self.position += count
+		return view
 
+	def read_struct(self, layout: struct.Struct) -> tuple:
+		""" Return the next fields unpacked with the given `layout`. """
 
-def read_int(buffer: BinaryIO) -> int:
-	return struct.unpack('<i', buffer.read(4))[0]
+		values = layout.unpack_from(self.buffer, self.position)
+		self.position += layout.size
+		return values
 
 
-def write_int(buffer: BinaryIO, value: int):
-	return buffer.write(struct.pack('<i', value))
+def read_int(buffer: BufferReader) -> int:
+	return int.from_bytes(buffer.read(4), 'little', signed=True)
 
 
-def read_float(buffer: BinaryIO) -> float:
-	return struct.unpack('<f', buffer.read(4))[0]
+def write_int(buffer: bytearray, value: int):
+	buffer += value.to_bytes(4, 'little', signed=True)
 
 
-def write_float(buffer: BinaryIO, value: float):
-	return buffer.write(struct.pack('<f', value))
+def read_constant_string(buffer: BufferReader, reference: str) -> str:
+	raw = buffer.read(len(reference) + 1)
 
+	# Skip the decoding step when the expected constant was read
+	if raw == reference.encode('ascii') + b'\0':
+		return reference
 
-def read_constant_string(buffer: BinaryIO, reference: str) -> str:
-	return buffer.read(len(reference) + 1)[:-1].decode('ascii')
+	return str(raw[:-1], 'ascii')
 
 
-def write_constant_string(buffer: BinaryIO, string: str):
-	return buffer.write(string.encode(encoding='ascii') + b'\0')
+def write_constant_string(buffer: bytearray, string: str):
+	assert string.isascii()
+	buffer += string.encode('latin-1') + b'\0'
 
 
-def read_variable_string(buffer: BinaryIO) -> str:
-	length = read_int(buffer)
-	return buffer.read(length).decode('ascii')
+def read_variable_string(buffer: BufferReader) -> str:
+	length = int.from_bytes(buffer.read(4), 'little', signed=True)
+	return str(buffer.read(length), 'ascii')
 
 
-def write_variable_string(buffer: BinaryIO, string: str):
-	write_int(buffer, len(string))
-	buffer.write(string.encode(encoding='ascii'))
+def write_variable_string(buffer: bytearray, string: str):
+	assert string.isascii()
 
+	# Encoding ASCII text with latin-1 skips the validation pass of ascii
+	data = string.encode('latin-1')
+	buffer += len(data).to_bytes(4, 'little') + data
 
-def read_interval(buffer: BinaryIO) -> EbSynthInterval:
+
+def read_interval(buffer: BufferReader) -> EbSynthInterval:
 	""" Return a frames interval read from the given `binary buffer`. """
 
-	return EbSynthInterval(
-		key_frame=read_int(buffer),
-		first_frame_is_used=read_bool(buffer),
-		final_frame_is_used=read_bool(buffer),
-		first_frame=read_int(buffer),
-		final_frame=read_int(buffer),
-		output_path=read_variable_string(buffer),
+	# Read all fixed-size fields of the interval in a single unpack
+	(
+		key_frame,
+		first_frame_is_used,
+		final_frame_is_used,
+		first_frame,
+		final_frame,
+	) = buffer.read_struct(INTERVAL_STRUCT)
+
+	# Keep the raw output path around to skip re-encoding it when writing
+	length = int.from_bytes(buffer.read(4), 'little', signed=True)
+	output_path_bytes = bytes(buffer.read(length))
+
+	interval = EbSynthInterval(
+		key_frame=key_frame,
+		first_frame_is_used=first_frame_is_used,
+		final_frame_is_used=final_frame_is_used,
+		first_frame=first_frame,
+		final_frame=final_frame,
+		output_path=str(output_path_bytes, 'ascii'),
 	)
+	interval.output_path_cache = (interval.output_path, output_path_bytes)
+	return interval
 
 
-def write_interval(buffer: BinaryIO, interval: EbSynthInterval):
+def write_interval(buffer: bytearray, interval: EbSynthInterval):
 	""" Write the given frames `interval` to the binary `buffer`. """
 
-	write_int(buffer, interval.key_frame)
-	write_bool(buffer, interval.first_frame_is_used)
-	write_bool(buffer, interval.final_frame_is_used)
-	write_int(buffer, interval.first_frame)
-	write_int(buffer, interval.final_frame)
-	write_variable_string(buffer, interval.output_path)
+	buffer += INTERVAL_STRUCT.pack(
+		interval.key_frame,
+		interval.first_frame_is_used,
+		interval.final_frame_is_used,
+		interval.first_frame,
+		interval.final_frame,
+	)
+
+	# Reuse the cached encoding as long as the output path is the same object
+	cache = interval.output_path_cache
+	if cache is None or cache[0] is not interval.output_path:
+		assert interval.output_path.isascii()
+		cache = (interval.output_path, interval.output_path.encode('latin-1'))
+		interval.output_path_cache = cache
 
+	data = cache[1]
+	buffer += len(data).to_bytes(4, 'little') + data
 
-def read_project(buffer: BinaryIO) -> EbSynthProject:
+
+def read_project(buffer: BufferReader) -> EbSynthProject:
 	""" Return a project read from the given binary `buffer`. """
 
+	# Bind the interval reader locally to avoid global lookups in the loop
+	read_one_interval = read_interval
+
+	# Read the data that precedes the fixed-size settings
+	program_version = read_constant_string(buffer, MAGIC_PROGRAM_VERSION)
+	video_images_path = read_variable_string(buffer)
+	mask_images_path = read_variable_string(buffer)
+	key_images_path = read_variable_string(buffer)
+
+	# Read all fixed-size settings in a single unpack
+	(
+		mask_images_enabled,
+		key_images_weight,
+		video_images_weight,
+		mask_images_weight,
+		mapping,
+		de_flicker,
+		diversity,
+	) = buffer.read_struct(PROJECT_SETTINGS_STRUCT)
+
+	# Preallocate the intervals list since its size is known up front
+	intervals = [None] * read_int(buffer)
+	for index in range(len(intervals)):
+		intervals[index] = read_one_interval(buffer)
+
 	# Construct the project from data that is always present
 	project = EbSynthProject(
-		program_version=read_constant_string(buffer, MAGIC_PROGRAM_VERSION),
-		video_images_path=read_variable_string(buffer),
-		mask_images_path=read_variable_string(buffer),
-		key_images_path=read_variable_string(buffer),
-		mask_images_enabled=read_bool(buffer),
-		key_images_weight=read_float(buffer),
-		video_images_weight=read_float(buffer),
-		mask_images_weight=read_float(buffer),
-		mapping=read_float(buffer),
-		de_flicker=read_float(buffer),
-		diversity=read_float(buffer),
-		intervals=[read_interval(buffer) for _ in range(read_int(buffer))],
+		program_version=program_version,
+		video_images_path=video_images_path,
+		mask_images_path=mask_images_path,
+		key_images_path=key_images_path,
+		mask_images_enabled=mask_images_enabled,
+		key_images_weight=key_images_weight,
+		video_images_weight=video_images_weight,
+		mask_images_weight=mask_images_weight,
+		mapping=mapping,
+		de_flicker=de_flicker,
+		diversity=diversity,
+		intervals=intervals,
 	)
 
 	# Continue reading from the buffer if it has extra metadata
 	if read_constant_string(buffer, MAGIC_EXTRA_METADATA):
-		project.synthesis_detail = read_int(buffer)
-		project.use_gpu = read_bool(buffer)
-		project.frames_per_second = read_float(buffer)
+		(
+			project.synthesis_detail,
+			project.use_gpu,
+			project.frames_per_second,
+		) = buffer.read_struct(PROJECT_METADATA_STRUCT)
 
 	return project
 
 
-def write_project(buffer: BinaryIO, project: EbSynthProject):
+def write_project(buffer: bytearray, project: EbSynthProject):
 	""" Write the given `project` to the binary `buffer`. """
 
-	write_constant_string(buffer, project.program_version)
+	# The program version is virtually always the magic constant
+	if project.program_version == MAGIC_PROGRAM_VERSION:
+		buffer += MAGIC_PROGRAM_VERSION_BYTES
+	else:
+		write_constant_string(buffer, project.program_version)
+
 	write_variable_string(buffer, project.video_images_path)
 	write_variable_string(buffer, project.mask_images_path)
 	write_variable_string(buffer, project.key_images_path)
-	write_bool(buffer, project.mask_images_enabled)
-	write_float(buffer, project.key_images_weight)
-	write_float(buffer, project.video_images_weight)
-	write_float(buffer, project.mask_images_weight)
-	write_float(buffer, project.mapping)
-	write_float(buffer, project.de_flicker)
-	write_float(buffer, project.diversity)
+	buffer += PROJECT_SETTINGS_STRUCT.pack(
+		project.mask_images_enabled,
+		project.key_images_weight,
+		project.video_images_weight,
+		project.mask_images_weight,
+		project.mapping,
+		project.de_flicker,
+		project.diversity,
+	)
+
+	# Bind the interval writer locally to avoid global lookups in the loop
+	write_one_interval = write_interval
 
 	write_int(buffer, len(project.intervals))
 	for interval in project.intervals:
-		write_interval(buffer, interval)
+		write_one_interval(buffer, interval)
+
+	buffer += MAGIC_EXTRA_METADATA_BYTES
+	buffer += PROJECT_METADATA_STRUCT.pack(
+		project.synthesis_detail,
+		project.use_gpu,
+		project.frames_per_second,
+	)
+	buffer += MAGIC_FINAL_INTEGER_BYTES
+
+
+# Scratch buffer reused by project_to_bytes, which is not thread-safe
+WRITE_BUFFER = bytearray()
 
-	write_constant_string(buffer, MAGIC_EXTRA_METADATA)
-	write_int(buffer, project.synthesis_detail)
-	write_bool(buffer, project.use_gpu)
-	write_float(buffer, project.frames_per_second)
-	write_int(buffer, MAGIC_FINAL_INTEGER)
+
+def project_to_bytes(project: EbSynthProject) -> bytes:
+	""" Return the binary serialization of the given `project`. """
+
+	# Reuse the module-level buffer instead of reallocating one per save
+	buffer = WRITE_BUFFER
+	buffer.clear()
+	write_project(buffer, project)
+	return bytes(buffer)
 
 
 def read_project_or_return_default(path: Path | None) -> EbSynthProject:
@@ -308,8 +444,7 @@ def read_project_or_return_default(path: Path | None) -> EbSynthProject:
 	if path is None:
 		return EbSynthProject()
 	else:
-		with open(path, 'rb') as file:
-			return read_project(file)
+		return read_project(BufferReader(memoryview(path.read_bytes())))
 
 
 def write_project_or_print_it(path: Path | None, project: EbSynthProject):
@@ -318,8 +453,27 @@ def write_project_or_print_it(path: Path | None, project: EbSynthProject):
 	if path is None:
 		print_project(project)
 	else:
-		with open(path, 'wb') as file:
-			write_project(file, project)
+		path.write_bytes(project_to_bytes(project))
+
+
+def compile_output_format(output: str) -> Callable[[int], str]:
+	"""
+	Return a function that interpolates an interval index into the `output`
+	format string. The usual single `{i}` or `{i:...}` placeholder is parsed
+	only once here; other format strings fall back to `str.format`.
+	"""
+
+	placeholder = re.fullmatch(r'(.*)\{i(?::([^{}]*))?\}(.*)', output, re.DOTALL)
+
+	if (
+		placeholder is None
+		or '{' in placeholder[1] or '}' in placeholder[1]
+		or '{' in placeholder[3] or '}' in placeholder[3]
+	):
+		return lambda index: output.format(i=index)
+
+	prefix, specification, suffix = placeholder.groups('')
+	return lambda index: prefix + format(index, specification) + suffix
 
 
 def create_intervals(
@@ -337,29 +491,27 @@ def create_intervals(
 	that can be interpolated with placeholder `i` as an integer.
 	"""
 
-	def create_one_interval(index_and_key: tuple[int, int]) -> EbSynthInterval:
-		""" Return a new interval around the given key frame. """
-
-		index, interval_key_frame = index_and_key
-		interval_first_frame = interval_key_frame - left
-		interval_final_frame = min(interval_key_frame + right, final)
-		output_path = output.format(i=index)
+	format_output_path = compile_output_format(output)
 
-		return EbSynthInterval(
-			key_frame=interval_key_frame,
+	return (
+		EbSynthInterval(
+			key_frame=key_frame,
 			first_frame_is_used=True,
 			final_frame_is_used=True,
-			first_frame=interval_first_frame,
-			final_frame=interval_final_frame,
-			output_path=output_path,
+			first_frame=key_frame - left,
+			final_frame=min(key_frame + right, final),
+			output_path=format_output_path(index),
 		)
-
-	return map(create_one_interval, enumerate(range(first + left, final, step)))
+		for index, key_frame in enumerate(range(first + left, final, step))
+	)
 
 
 def main():
 	""" Command-line editor for EbSynth (EBS) project files. """
 
+	# Deferred so importing this module for its API skips argparse entirely
+	import argparse
+
 	parser = argparse.ArgumentParser(description=main.__doc__)
 
 	# Input and output arguments
@@ -492,27 +644,10 @@ def main():
 			output.replace('%', ':'),
 		))
 
-	def map_argument_to_project_setting(name: str):
-		if (value := arguments.__dict__[name]) is not None:
-			project.__dict__[name] = value
-
-	map_argument_to_project_setting('frames_per_second')
-
-	map_argument_to_project_setting('key_images_path')
-	map_argument_to_project_setting('video_images_path')
-	map_argument_to_project_setting('mask_images_path')
-
-	map_argument_to_project_setting('key_images_weight')
-	map_argument_to_project_setting('video_images_weight')
-	map_argument_to_project_setting('mask_images_weight')
-	map_argument_to_project_setting('mask_images_enabled')
-
-	map_argument_to_project_setting('mapping')
-	map_argument_to_project_setting('de_flicker')
-	map_argument_to_project_setting('diversity')
-
-	map_argument_to_project_setting('synthesis_detail')
-	map_argument_to_project_setting('use_gpu')
+	# Map every supplied argument to its project setting
+	for name in MAPPED_ARGUMENT_NAMES:
+		if (value := getattr(arguments, name)) is not None:
+			setattr(project, name, value)
 
 	write_project_or_print_it(arguments.output, project)
 